@@ -3,12 +3,20 @@
 
 set -eu
 
-COMMAND_NAME=$(basename "$0")
+COMMAND_NAME=${0##*/}
 REPO_ROOT=""
 INCLUDE_CLEAN=0
 MODULES=""
 MODULE_FILTER=""
-VERBOSE=0
+JOBS=""
+# A literal tab, spelled out to avoid a command substitution at start-up.
+TAB='	'
+NL='
+'
+ORIG_IFS=$IFS
+STATUS_LOADED=0
+LAUNCHED=0
+REAPED=0
 
 usage() {
     cat <<USAGE
@@ -18,6 +26,9 @@ Global options:
   --repo-root <path>      Path to the ape repository that hosts the submodules (default: current directory)
   --modules <names>       Comma-separated list of submodule names to operate on (default: dirty modules)
   --include-clean         Include clean submodules when running the status command
+  --jobs <n>              Number of submodules to process concurrently (default: 4 per CPU, at most 32;
+                          use 1 to run sequentially with interactive prompts; mr
+                          defaults to 1)
   --verbose               Enable debug logging
   -h, --help              Show this help message
 
@@ -32,10 +43,16 @@ Run "$COMMAND_NAME <command> --help" for help with a specific command.
 USAGE
 }
 
+# Debug logging is a no-op until --verbose swaps in enable_debug's version, so
+# quiet runs skip the per-call flag test.
 log_debug() {
-    if [ "$VERBOSE" -eq 1 ]; then
+    :
+}
+
+enable_debug() {
+    log_debug() {
         printf '[submodule-workflow] %s\n' "$1" >&2
-    fi
+    }
 }
 
 die() {
@@ -43,6 +60,10 @@ die() {
     exit 1
 }
 
+warn() {
+    printf 'Warning: %s\n' "$1" >&2
+}
+
 require_argument() {
     opt="$1"
     shift
@@ -72,8 +93,14 @@ while [ $# -gt 0 ]; do
             INCLUDE_CLEAN=1
             shift
             ;;
+        --jobs)
+            shift
+            require_argument --jobs "$@"
+            JOBS="$1"
+            shift
+            ;;
         --verbose)
-            VERBOSE=1
+            enable_debug
             shift
             ;;
         -h|--help)
@@ -109,81 +136,499 @@ if [ ! -f "$REPO_ROOT/.gitmodules" ]; then
     die "Expected to find a .gitmodules file in $REPO_ROOT; is this the ape repository?"
 fi
 
+if [ -n "$JOBS" ]; then
+    case "$JOBS" in
+        *[!0-9]*|0*)
+            die "--jobs expects a positive integer, got: $JOBS"
+            ;;
+    esac
+fi
+
 if [ -n "$MODULES" ]; then
-    MODULE_FILTER=$(printf '%s' "$MODULES" | tr ',:' ' ')
+    old_ifs=$IFS
+    IFS=',:'
+    set -f
+    for want in $MODULES; do
+        if [ -n "$want" ]; then
+            MODULE_FILTER="$MODULE_FILTER$NL$want"
+        fi
+    done
+    set +f
+    IFS=$old_ifs
 fi
 
-RAW_CONFIG=$(mktemp)
-SUBMODULE_CACHE=$(mktemp)
+WORK_DIR=$(mktemp -d)
+SSH_CONTROL_DIR=""
+SHARED_SSH_OPTIONS=""
+# Commands that reach remotes set SSH_WORKERS=1 so that for_each_module picks
+# an ssh command for each worker; the others skip the per-module lookup.
+SSH_WORKERS=0
 cleanup() {
-    rm -f "$RAW_CONFIG" "$SUBMODULE_CACHE"
+    if [ -n "$SSH_CONTROL_DIR" ]; then
+        # Stop the persisted ssh masters now rather than on their idle timeout.
+        for socket in "$SSH_CONTROL_DIR"/*; do
+            if [ -S "$socket" ]; then
+                ssh -o ControlPath="$socket" -O exit ape-submodule-workflow >/dev/null 2>&1 || true
+            fi
+        done
+        rm -rf "$SSH_CONTROL_DIR"
+    fi
+    rm -rf "$WORK_DIR"
 }
-trap cleanup EXIT HUP INT TERM
 
-if ! git -C "$REPO_ROOT" config --file .gitmodules --get-regexp '^submodule\..*\.path$' >"$RAW_CONFIG" 2>/dev/null; then
-    :
-fi
+# Stop the workers still in flight before exiting on a signal. Background
+# jobs ignore SIGINT, and killing only a worker's subshell would leave its git
+# (and ssh) children running, so signal every process below the workers.
+stop_workers() {
+    pids=""
+    i=$REAPED
+    while [ "$i" -lt "$LAUNCHED" ]; do
+        eval "pids=\"\$pids \$MODULE_PID_$i\""
+        i=$((i + 1))
+    done
+    if [ -z "$pids" ]; then
+        return 0
+    fi
+    tree=$(ps -A -o pid= -o ppid= 2>/dev/null | awk -v roots="$pids" '
+        BEGIN {
+            count = split(roots, root, " ")
+            for (i = 1; i <= count; i++) {
+                wanted[root[i]] = 1
+            }
+        }
+        { parent[$1] = $2 }
+        END {
+            do {
+                grown = 0
+                for (pid in parent) {
+                    if (!(pid in wanted) && (parent[pid] in wanted)) {
+                        wanted[pid] = 1
+                        grown = 1
+                    }
+                }
+            } while (grown)
+            for (pid in wanted) {
+                print pid
+            }
+        }
+    ') || tree=$pids
+    kill -TERM $tree 2>/dev/null || true
+    wait 2>/dev/null || true
+}
+
+# Exit with <status> once the workers are gone; the EXIT trap then removes
+# WORK_DIR, so no worker output is replayed from a deleted directory.
+interrupted() {
+    trap '' HUP INT TERM
+    stop_workers
+    exit "$1"
+}
+trap cleanup EXIT
+trap 'interrupted 129' HUP
+trap 'interrupted 130' INT
+trap 'interrupted 143' TERM
 
-if [ ! -s "$RAW_CONFIG" ]; then
-    printf 'No submodules registered in .gitmodules.\n'
-    exit 0
+# The parsed .gitmodules is kept next to the parent's git metadata, together
+# with a copy of the .gitmodules it was parsed from, and reused while that copy
+# still matches byte for byte; mtimes alone miss edits restored by "cp -p",
+# "rsync -a" or "tar x". It holds names and relative paths only, so it stays
+# valid when the checkout is moved or copied; load_all_status joins them onto
+# the current REPO_ROOT. A newer copy of this script also invalidates it.
+# Resolve the git directory by hand, as .git is a "gitdir:" file when ape is
+# itself checked out as a submodule.
+CACHE_DIR=""
+if [ -d "$REPO_ROOT/.git" ]; then
+    CACHE_DIR="$REPO_ROOT/.git"
+elif [ -f "$REPO_ROOT/.git" ]; then
+    IFS= read -r gitdir_line <"$REPO_ROOT/.git" || true
+    case "$gitdir_line" in
+        "gitdir: /"*)
+            CACHE_DIR="${gitdir_line#gitdir: }"
+            ;;
+        "gitdir: "*)
+            CACHE_DIR="$REPO_ROOT/${gitdir_line#gitdir: }"
+            ;;
+    esac
+fi
+PARSED_CACHE=""
+PARSED_SOURCE=""
+if [ -n "$CACHE_DIR" ]; then
+    PARSED_CACHE="$CACHE_DIR/ape-submodule-workflow.modules"
+    PARSED_SOURCE="$CACHE_DIR/ape-submodule-workflow.gitmodules"
 fi
 
-while IFS= read -r line; do
-    key=${line%% *}
-    rel_path=${line#* }
-    [ -n "$key" ] || continue
-    name=$(printf '%s\n' "$key" | sed 's/^submodule\."//; s/"\.path$//')
-    if abs_path=$(cd "$REPO_ROOT/$rel_path" 2>/dev/null && pwd); then
-        :
-    else
-        abs_path="$REPO_ROOT/$rel_path"
-    fi
-    printf '%s\t%s\t%s\n' "$name" "$abs_path" "$rel_path"
-done <"$RAW_CONFIG" >"$SUBMODULE_CACHE"
+if [ -n "$PARSED_CACHE" ] && [ -s "$PARSED_CACHE" ] &&
+    cmp -s "$REPO_ROOT/.gitmodules" "$PARSED_SOURCE" &&
+    [ -z "$(find "$0" -newer "$PARSED_CACHE" 2>/dev/null)" ]; then
+    log_debug "Reusing parsed submodules from $PARSED_CACHE."
+    SUBMODULE_CACHE="$PARSED_CACHE"
+else
+    SUBMODULE_CACHE="$WORK_DIR/submodules"
 
-if [ ! -s "$SUBMODULE_CACHE" ]; then
-    printf 'No submodules registered in .gitmodules.\n'
-    exit 0
-fi
+    # .gitmodules only ever holds [submodule "<name>"] sections with
+    # "key = value" lines, so a single awk pass reads it without spawning git
+    # config plus a sed per entry.
+    awk -v OFS="$TAB" '
+        /^[ \t]*\[/ {
+            name = ""
+            # Section names are case-insensitive; the subsection is not.
+            if (match(tolower($0), /^[ \t]*\[submodule[ \t]+"([^"\\]|\\.)*"[ \t]*\]/)) {
+                # Keep what lies between the quotes and undo the \" and \\
+                # escapes git writes for quotes and backslashes in names.
+                quoted = substr($0, RSTART, RLENGTH)
+                quoted = substr(quoted, index(quoted, "\"") + 1)
+                sub(/"[ \t]*\]$/, "", quoted)
+                for (i = 1; i <= length(quoted); i++) {
+                    c = substr(quoted, i, 1)
+                    if (c == "\\") {
+                        c = substr(quoted, ++i, 1)
+                    }
+                    name = name c
+                }
+            }
+            next
+        }
+        name != "" && /^[ \t]*[A-Za-z][-A-Za-z0-9]*[ \t]*=/ {
+            raw = $0
+            sub(/^[ \t]*/, "", raw)
+            key = raw
+            sub(/[ \t]*=.*$/, "", key)
+            if (tolower(key) != "path") {
+                next
+            }
+            sub(/^[^=]*=/, "", raw)
+            sub(/\r$/, "", raw)
+            # Decode the value as git does: keys are case-insensitive, quotes
+            # are dropped, \ escapes are undone, a # or ; outside quotes starts
+            # a comment, unquoted blanks are trimmed at either end and a
+            # trailing \ continues the value on the next line.
+            value = ""
+            blanks = 0
+            in_quotes = 0
+            for (i = 1; i <= length(raw); i++) {
+                c = substr(raw, i, 1)
+                if (!in_quotes && (c == " " || c == "\t")) {
+                    if (value != "") {
+                        blanks++
+                    }
+                    continue
+                }
+                if (!in_quotes && (c == "#" || c == ";")) {
+                    break
+                }
+                for (; blanks > 0; blanks--) {
+                    value = value " "
+                }
+                if (c == "\"") {
+                    in_quotes = !in_quotes
+                    continue
+                }
+                if (c == "\\") {
+                    if (i == length(raw)) {
+                        if ((getline raw) <= 0) {
+                            break
+                        }
+                        sub(/\r$/, "", raw)
+                        i = 0
+                        continue
+                    }
+                    c = substr(raw, ++i, 1)
+                    if (c == "n") {
+                        c = "\n"
+                    } else if (c == "t") {
+                        c = "\t"
+                    } else if (c == "b") {
+                        c = "\b"
+                    }
+                }
+                value = value c
+            }
+            # The last path wins, as with "git config", but each module keeps
+            # the place of its first section.
+            if (!(name in path)) {
+                order[++count] = name
+            }
+            path[name] = value
+        }
+        END {
+            for (i = 1; i <= count; i++) {
+                if (path[order[i]] != "") {
+                    print order[i], path[order[i]]
+                }
+            }
+        }
+    ' "$REPO_ROOT/.gitmodules" >"$SUBMODULE_CACHE"
 
-module_exists() {
-    name="$1"
-    if grep -F "${name}\t" "$SUBMODULE_CACHE" >/dev/null 2>&1; then
-        return 0
+    if [ ! -s "$SUBMODULE_CACHE" ]; then
+        printf 'No submodules registered in .gitmodules.\n'
+        exit 0
     fi
-    return 1
-}
 
+    if [ -n "$PARSED_CACHE" ]; then
+        # Replace both files atomically so concurrent runs never read half of
+        # one. The source copy goes first and is written last, so a run in
+        # between sees a mismatch rather than a stale parse.
+        rm -f "$PARSED_SOURCE"
+        if cp "$SUBMODULE_CACHE" "$PARSED_CACHE.$$" 2>/dev/null &&
+            mv -f "$PARSED_CACHE.$$" "$PARSED_CACHE" 2>/dev/null &&
+            cp "$REPO_ROOT/.gitmodules" "$PARSED_SOURCE.$$" 2>/dev/null; then
+            mv -f "$PARSED_SOURCE.$$" "$PARSED_SOURCE" 2>/dev/null || true
+        fi
+        rm -f "$PARSED_CACHE.$$" "$PARSED_SOURCE.$$"
+    fi
+fi
+
+# MODULE_FILTER holds one requested name per line, so membership is a single
+# pattern match rather than a loop over every requested name, and names may
+# contain spaces.
 module_selected() {
     name="$1"
     if [ -z "$MODULE_FILTER" ]; then
         return 0
     fi
-    for want in $MODULE_FILTER; do
-        if [ "$want" = "$name" ]; then
+    case "$MODULE_FILTER$NL" in
+        *"$NL$name$NL"*)
             return 0
-        fi
-    done
+            ;;
+    esac
     return 1
 }
 
 if [ -n "$MODULE_FILTER" ]; then
-    for want in $MODULE_FILTER; do
-        if ! module_exists "$want"; then
-            die "Unknown submodule: $want"
+    # Subtract the known names from the requested ones in one awk pass and
+    # report every unknown name at once, sorted and without duplicates.
+    missing=$(WANTED="$MODULE_FILTER" awk -F "$TAB" '
+        BEGIN {
+            count = split(ENVIRON["WANTED"], names, "\n")
+            for (i = 1; i <= count; i++) {
+                if (names[i] != "") {
+                    requested[names[i]] = 1
+                }
+            }
+        }
+        { delete requested[$1] }
+        END {
+            count = 0
+            for (name in requested) {
+                for (i = count; i > 0 && sorted[i] > name; i--) {
+                    sorted[i + 1] = sorted[i]
+                }
+                sorted[i + 1] = name
+                count++
+            }
+            for (i = 1; i <= count; i++) {
+                printf "%s%s", (i > 1 ? ", " : ""), sorted[i]
+            }
+        }
+    ' "$SUBMODULE_CACHE")
+    case "$missing" in
+        "")
+            ;;
+        *", "*)
+            die "Unknown submodules: $missing"
+            ;;
+        *)
+            die "Unknown submodule: $missing"
+            ;;
+    esac
+fi
+
+# Split a MODULE_TABLE entry into name, path, rel and dirty.
+split_entry() {
+    name=${1%%"$TAB"*}
+    rest=${1#*"$TAB"}
+    path=${rest%%"$TAB"*}
+    rest=${rest#*"$TAB"}
+    rel=${rest%%"$TAB"*}
+    dirty=${rest#*"$TAB"}
+}
+
+# Pick the default worker count the first time it is needed, so commands that
+# never fan out do not pay for the getconf call.
+resolve_jobs() {
+    if [ -n "$JOBS" ]; then
+        return 0
+    fi
+    # The per-module work is dominated by git process start-up and network
+    # round-trips rather than CPU, so oversubscribe the available cores.
+    JOBS=$(getconf _NPROCESSORS_ONLN 2>/dev/null || printf '1')
+    case "$JOBS" in
+        ''|*[!0-9]*|0*)
+            JOBS=1
+            ;;
+    esac
+    JOBS=$((JOBS * 4))
+    if [ "$JOBS" -gt 32 ]; then
+        JOBS=32
+    fi
+}
+
+# Expand every entry of the submodule cache to name, absolute path (the
+# already canonical REPO_ROOT joined with the relative path, so no cd per
+# module), relative path and a dirty flag (1 or 0). A single porcelain v2
+# status of the parent reports, for each submodule, whether it has tracked
+# ("M") or untracked ("U") changes, which saves running a separate "git
+# status" inside every submodule. The status is streamed straight into awk,
+# which classifies records as git emits them. The annotated table is kept in
+# MODULE_TABLE rather than a file: dash's read builtin issues one read(2) per
+# byte, while expanding a variable costs no system calls at all.
+load_all_status() {
+    if [ "$STATUS_LOADED" -eq 1 ]; then
+        return 0
+    fi
+    MODULE_TABLE=$(git -C "$REPO_ROOT" status --porcelain=v2 -z --ignore-submodules=none --untracked-files=normal 2>/dev/null |
+        tr '\000' '\n' | ROOT="$REPO_ROOT" awk -F "$TAB" -v OFS="$TAB" '
+        !cache {
+            if (skip_orig_path) {
+                skip_orig_path = 0
+                next
+            }
+            kind = substr($0, 1, 1)
+            if (kind == "2") {
+                # Renames carry their original path as a separate record.
+                skip_orig_path = 1
+            }
+            if (kind != "1" && kind != "2" && kind != "u") {
+                next
+            }
+            split($0, field, " ")
+            if (field[3] !~ /^S.(M.|.U)$/) {
+                next
+            }
+            prefix_fields = kind == "1" ? 8 : kind == "2" ? 9 : 10
+            entry_path = $0
+            for (i = 0; i < prefix_fields; i++) {
+                sub(/^[^ ]* /, "", entry_path)
+            }
+            dirty[entry_path] = 1
+            next
+        }
+        { print $1, ENVIRON["ROOT"] "/" $2, $2, ($2 in dirty) ? 1 : 0 }
+    ' - cache=1 "$SUBMODULE_CACHE")
+    STATUS_LOADED=1
+}
+
+# Record the outcome of the worker with index $REAPED and replay its output.
+finish_module() {
+    rc="$1"
+    if [ "$JOBS" -gt 1 ]; then
+        cat "$WORK_DIR/$REAPED.err" >&2
+        cat "$WORK_DIR/$REAPED.out"
+    fi
+    if [ "$rc" -ne 0 ]; then
+        FAILED=1
+    fi
+    REAPED=$((REAPED + 1))
+}
+
+reap_module() {
+    eval "pid=\$MODULE_PID_$REAPED"
+    rc=0
+    wait "$pid" || rc=$?
+    finish_module "$rc"
+}
+
+# Run "<worker> <name> <path> <rel> <dirty> [args...]" for every selected
+# submodule ("all") or only the dirty ones ("dirty"), keeping up to $JOBS
+# workers in flight. Each worker runs in its own subshell; output is buffered
+# per module and replayed in .gitmodules order so concurrent workers never
+# interleave. On return FOUND holds the number of modules visited; the script
+# exits once every worker has finished if any of them failed.
+for_each_module() {
+    scope="$1"
+    worker="$2"
+    shift 2
+    resolve_jobs
+    load_all_status
+    FAILED=0
+    LAUNCHED=0
+    REAPED=0
+    exec 3<&0
+    set -f
+    IFS=$NL
+    for entry in $MODULE_TABLE; do
+        IFS=$ORIG_IFS
+        split_entry "$entry"
+        module_selected "$name" || continue
+        if [ "$scope" = dirty ] && [ "$dirty" -eq 0 ]; then
+            continue
+        fi
+        if [ "$JOBS" -eq 1 ]; then
+            # Run in the foreground on the caller's stdin so git, glab and gh
+            # can still prompt.
+            set +e
+            (
+                set -e
+                if [ "$SSH_WORKERS" -eq 1 ]; then
+                    use_worker_ssh "$path" 0
+                fi
+                "$worker" "$name" "$path" "$rel" "$dirty" "$@"
+            ) <&3
+            rc=$?
+            set -e
+            LAUNCHED=$((LAUNCHED + 1))
+            finish_module "$rc"
+            continue
+        fi
+        if [ "$LAUNCHED" -ge $((REAPED + JOBS)) ]; then
+            reap_module
         fi
+        # Background workers cannot answer prompts, and git would ask for
+        # credentials (and ssh for passphrases or host keys) on the terminal
+        # and stall the whole batch; fail instead.
+        (
+            set -e
+            export GIT_TERMINAL_PROMPT="${GIT_TERMINAL_PROMPT:-0}"
+            if [ "$SSH_WORKERS" -eq 1 ]; then
+                use_worker_ssh "$path" 1
+            fi
+            "$worker" "$name" "$path" "$rel" "$dirty" "$@"
+        ) </dev/null >"$WORK_DIR/$LAUNCHED.out" 2>"$WORK_DIR/$LAUNCHED.err" &
+        eval "MODULE_PID_$LAUNCHED=\$!"
+        LAUNCHED=$((LAUNCHED + 1))
     done
-fi
+    IFS=$ORIG_IFS
+    set +f
+    exec 3<&-
+
+    while [ "$REAPED" -lt "$LAUNCHED" ]; do
+        reap_module
+    done
+    FOUND=$LAUNCHED
 
+    if [ "$FAILED" -eq 1 ]; then
+        exit 1
+    fi
+}
+
+# Set CURRENT_BRANCH to the branch checked out in <path>, or to the empty
+# string on a detached HEAD. Results are handed back in variables rather than
+# printed, so callers need no command substitution (and thus no fork).
 current_branch() {
     path="$1"
-    branch=$(git -C "$path" rev-parse --abbrev-ref HEAD 2>/dev/null || true)
-    if [ -z "$branch" ] || [ "$branch" = "HEAD" ]; then
-        printf '\n'
-    else
-        printf '%s\n' "$branch"
-    fi
+    CURRENT_BRANCH=$(git -C "$path" symbolic-ref --quiet --short HEAD 2>/dev/null) || CURRENT_BRANCH=""
+}
+
+# Set BRANCH_STATE to "current" when <branch> is checked out in <path>,
+# "exists" when it is another local branch and "missing" otherwise. One
+# for-each-ref answers both questions that would otherwise take two rev-parse
+# calls.
+branch_state() {
+    path="$1"
+    branch="$2"
+
+    refs=$(git -C "$path" for-each-ref --format='%(HEAD)%(refname)' "refs/heads/$branch" 2>/dev/null || true)
+    case "$NL$refs$NL" in
+        *"${NL}*refs/heads/$branch$NL"*)
+            BRANCH_STATE=current
+            ;;
+        *"${NL} refs/heads/$branch$NL"*)
+            BRANCH_STATE=exists
+            ;;
+        *)
+            BRANCH_STATE=missing
+            ;;
+    esac
 }
 
 ensure_branch() {
@@ -193,66 +638,88 @@ ensure_branch() {
     remote="$4"
     force_flag="$5"
 
-    current=$(current_branch "$path")
-    if [ "$current" = "$branch" ]; then
-        printf '%s\n' "$branch"
+    branch_state "$path" "$branch"
+    if [ "$BRANCH_STATE" = current ]; then
         return 0
     fi
 
-    if git -C "$path" rev-parse --verify "$branch" >/dev/null 2>&1; then
+    if [ "$BRANCH_STATE" = exists ]; then
         log_debug "Branch $branch already exists in $path; checking out."
-        git -C "$path" checkout "$branch" >/dev/null
-        printf '%s\n' "$branch"
+        git -C "$path" checkout -q "$branch"
         return 0
     fi
 
-    status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-    if [ -n "$base" ] && [ -z "$status" ]; then
+    # Branch straight off the freshly fetched base instead of checking out
+    # and pulling the base first; that saves two git processes and the second
+    # network round-trip "pull" would make. FETCH_HEAD is used as the start
+    # point because it exists even when the remote has no tracking refspec.
+    # The modules being branched are dirty by definition; "checkout -b" carries
+    # their local changes onto the new branch, or refuses loudly when they
+    # conflict with the base.
+    start_point=""
+    if [ -n "$base" ]; then
         log_debug "Fetching $remote/$base in $path before creating $branch."
-        git -C "$path" fetch "$remote" "$base" >/dev/null 2>&1 || true
-        git -C "$path" checkout "$base" >/dev/null 2>&1 || true
-        git -C "$path" pull "$remote" "$base" >/dev/null 2>&1 || true
+        if git -C "$path" fetch -q "$remote" "$base" >/dev/null 2>&1; then
+            start_point=FETCH_HEAD
+        elif git -C "$path" rev-parse --verify -q "refs/heads/$base" >/dev/null; then
+            warn "Could not fetch $remote/$base in $path; branching $branch from the local $base."
+            start_point=$base
+        else
+            warn "Could not fetch $remote/$base in $path; branching $branch from HEAD."
+        fi
     fi
 
     if [ "$force_flag" -eq 1 ]; then
-        git -C "$path" checkout -B "$branch" >/dev/null
+        git -C "$path" checkout -q -B "$branch" $start_point
     else
-        git -C "$path" checkout -b "$branch" >/dev/null
+        git -C "$path" checkout -q -b "$branch" $start_point
     fi
-    printf '%s\n' "$branch"
 }
 
+# Push quietly: progress and ref listings would only be buffered and replayed
+# by for_each_module, and the caller reports the result itself. Errors still
+# reach stderr.
 push_branch() {
     path="$1"
     branch="$2"
     remote="$3"
     set_upstream="$4"
+    dry_run="$5"
 
+    set -- git -C "$path" push -q
     if [ "$set_upstream" -eq 1 ]; then
-        git -C "$path" push -u "$remote" "$branch"
+        set -- "$@" -u
+    fi
+    set -- "$@" "$remote" "$branch"
+    if [ "$dry_run" -eq 1 ]; then
+        log_debug "Dry run; not running: $*"
+        return 0
+    fi
+    "$@"
+}
+
+status_worker() {
+    name="$1"
+    path="$2"
+    dirty="$4"
+
+    printf '%s (%s):\n' "$name" "$path"
+    if [ "$dirty" -eq 1 ]; then
+        git -C "$path" status --porcelain 2>/dev/null | sed 's/^/  /'
     else
-        git -C "$path" push "$remote" "$branch"
+        printf '  clean\n'
     fi
 }
 
 status_command() {
     include_clean="$1"
-    found=0
-    while IFS='\t' read -r name path rel; do
-        module_selected "$name" || continue
-        status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-        if [ -n "$status" ] || [ "$include_clean" -eq 1 ]; then
-            found=1
-            printf '%s (%s):\n' "$name" "$path"
-            if [ -n "$status" ]; then
-                printf '%s\n' "$status" | sed 's/^/  /'
-            else
-                printf '  clean\n'
-            fi
-        fi
-    done <"$SUBMODULE_CACHE"
+    if [ "$include_clean" -eq 1 ]; then
+        for_each_module all status_worker
+    else
+        for_each_module dirty status_worker
+    fi
 
-    if [ $found -eq 0 ]; then
+    if [ "$FOUND" -eq 0 ]; then
         if [ "$include_clean" -eq 1 ]; then
             printf 'No submodules matched the provided filters.\n'
         else
@@ -261,50 +728,119 @@ status_command() {
     fi
 }
 
+branch_worker() {
+    name="$1"
+    path="$2"
+    branch_name="$5"
+    base="$6"
+    remote="$7"
+    force_flag="$8"
+
+    ensure_branch "$path" "$branch_name" "$base" "$remote" "$force_flag"
+    printf 'Checked out %s in %s (%s).\n' "$branch_name" "$name" "$path"
+}
+
 branch_command() {
-    branch_name="$1"
     base="$2"
-    remote="$3"
-    force_flag="$4"
-
-    found=0
-    while IFS='\t' read -r name path rel; do
-        module_selected "$name" || continue
-        status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-        if [ -z "$status" ]; then
-            continue
-        fi
-        found=1
-        checked=$(ensure_branch "$path" "$branch_name" "$base" "$remote" "$force_flag")
-        printf 'Checked out %s in %s (%s).\n' "$checked" "$name" "$path"
-    done <"$SUBMODULE_CACHE"
+    if [ -n "$base" ]; then
+        SSH_WORKERS=1
+    fi
+    for_each_module dirty branch_worker "$@"
 
-    if [ $found -eq 0 ]; then
+    if [ "$FOUND" -eq 0 ]; then
         printf 'No dirty submodules detected; nothing to branch.\n'
     fi
 }
 
+push_worker() {
+    name="$1"
+    path="$2"
+    remote="$5"
+    set_upstream="$6"
+    dry_run="$7"
+
+    current_branch "$path"
+    branch=$CURRENT_BRANCH
+    if [ -z "$branch" ]; then
+        die "Submodule $name is in a detached HEAD state; cannot push without a branch."
+    fi
+    push_branch "$path" "$branch" "$remote" "$set_upstream" "$dry_run"
+    if [ "$dry_run" -eq 1 ]; then
+        printf 'Would push %s (%s) to %s/%s.\n' "$name" "$path" "$remote" "$branch"
+    else
+        printf 'Pushed %s (%s) to %s/%s.\n' "$name" "$path" "$remote" "$branch"
+    fi
+}
+
+# Let pushes to the same SSH server share one connection. ssh names control
+# sockets after host, port and user (%C), so a submodule hosted on the same
+# server as an earlier push reuses its TCP connection and key exchange instead
+# of paying for its own. Pushes started at the same moment race to become the
+# master and mostly connect on their own, so the saving comes from pushes
+# that start once a master is up: with --jobs 1, or beyond the first wave.
+# Callers that set their own ssh command keep it; use_worker_ssh also skips
+# modules that configure core.sshCommand.
+share_ssh_connections() {
+    if [ -n "${GIT_SSH_COMMAND:-}" ] || [ -n "${GIT_SSH:-}" ]; then
+        return 0
+    fi
+    # Unix socket paths are limited to roughly 100 bytes, so stay out of a
+    # possibly long $TMPDIR.
+    SSH_CONTROL_DIR=$(mktemp -d /tmp/ape-ssh.XXXXXX 2>/dev/null) || return 0
+    SHARED_SSH_OPTIONS="-o ControlMaster=auto -o ControlPath=$SSH_CONTROL_DIR/%C -o ControlPersist=60"
+    log_debug "Sharing ssh connections through $SSH_CONTROL_DIR."
+}
+
+# Export the ssh command for a worker on <path>: with BatchMode when <batch>
+# is 1, as concurrent passphrase or host-key prompts would all fight over the
+# caller's terminal, plus the options from share_ssh_connections. Workers run
+# in their own subshell, so the export only affects that worker. An ssh
+# command set by the caller is kept, and so is a submodule's own
+# core.sshCommand (e.g. a per-repo deploy key), which GIT_SSH_COMMAND would
+# override.
+use_worker_ssh() {
+    if [ -n "${GIT_SSH_COMMAND:-}" ] || [ -n "${GIT_SSH:-}" ] ||
+        git -C "$1" config core.sshCommand >/dev/null 2>&1; then
+        return 0
+    fi
+    ssh_command=ssh
+    if [ "$2" -eq 1 ]; then
+        ssh_command="$ssh_command -o BatchMode=yes"
+    fi
+    if [ -n "$SHARED_SSH_OPTIONS" ]; then
+        ssh_command="$ssh_command $SHARED_SSH_OPTIONS"
+    fi
+    if [ "$ssh_command" != ssh ]; then
+        GIT_SSH_COMMAND=$ssh_command
+        export GIT_SSH_COMMAND
+    fi
+}
+
 push_command() {
-    remote="$1"
-    set_upstream="$2"
+    dry_run="$3"
 
-    found=0
-    while IFS='\t' read -r name path rel; do
-        module_selected "$name" || continue
-        status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-        if [ -z "$status" ]; then
-            continue
-        fi
-        branch=$(current_branch "$path")
-        if [ -z "$branch" ]; then
-            die "Submodule $name is in a detached HEAD state; cannot push without a branch."
+    if [ "$dry_run" -eq 0 ]; then
+        SSH_WORKERS=1
+        load_all_status
+        pushes=0
+        set -f
+        IFS=$NL
+        for entry in $MODULE_TABLE; do
+            IFS=$ORIG_IFS
+            split_entry "$entry"
+            if module_selected "$name" && [ "$dirty" -eq 1 ]; then
+                pushes=$((pushes + 1))
+            fi
+        done
+        IFS=$ORIG_IFS
+        set +f
+        if [ "$pushes" -gt 1 ]; then
+            share_ssh_connections
         fi
-        found=1
-        push_branch "$path" "$branch" "$remote" "$set_upstream"
-        printf 'Pushed %s (%s) to %s/%s.\n' "$name" "$path" "$remote" "$branch"
-    done <"$SUBMODULE_CACHE"
+    fi
+    for_each_module dirty push_worker "$@"
 
-    if [ $found -eq 0 ]; then
+    if [ "$FOUND" -eq 0 ]; then
         printf 'No dirty submodules detected; nothing to push.\n'
     fi
 }
@@ -313,37 +849,56 @@ lowercase() {
     printf '%s' "$1" | tr '[:upper:]' '[:lower:]'
 }
 
-detect_mr_tool() {
-    remote_url=$(lowercase "$1")
-    if printf '%s' "$remote_url" | grep -q 'gitlab'; then
-        if command -v glab >/dev/null 2>&1; then
-            printf 'glab\n'
-            return 0
-        fi
+# Look up glab and gh on PATH once, before mr fans out, instead of walking
+# PATH twice for every submodule.
+find_mr_tools() {
+    HAVE_GLAB=0
+    HAVE_GH=0
+    if command -v glab >/dev/null 2>&1; then
+        HAVE_GLAB=1
     fi
-    if printf '%s' "$remote_url" | grep -q 'github'; then
-        if command -v gh >/dev/null 2>&1; then
-            printf 'gh\n'
-            return 0
-        fi
+    if command -v gh >/dev/null 2>&1; then
+        HAVE_GH=1
     fi
+}
+
+# Set MR_TOOL to the CLI (glab or gh) to use for a remote URL, or to the
+# empty string when neither is available. Requires find_mr_tools.
+detect_mr_tool() {
+    remote_url=$(lowercase "$1")
+    case "$remote_url" in
+        *gitlab*)
+            if [ "$HAVE_GLAB" -eq 1 ]; then
+                MR_TOOL=glab
+                return 0
+            fi
+            ;;
+    esac
+    case "$remote_url" in
+        *github*)
+            if [ "$HAVE_GH" -eq 1 ]; then
+                MR_TOOL=gh
+                return 0
+            fi
+            ;;
+    esac
     case "$remote_url" in
         *.git)
-            if command -v gh >/dev/null 2>&1; then
-                printf 'gh\n'
+            if [ "$HAVE_GH" -eq 1 ]; then
+                MR_TOOL=gh
                 return 0
             fi
             ;;
     esac
-    if command -v glab >/dev/null 2>&1; then
-        printf 'glab\n'
+    if [ "$HAVE_GLAB" -eq 1 ]; then
+        MR_TOOL=glab
         return 0
     fi
-    if command -v gh >/dev/null 2>&1; then
-        printf 'gh\n'
+    if [ "$HAVE_GH" -eq 1 ]; then
+        MR_TOOL=gh
         return 0
     fi
-    printf '\n'
+    MR_TOOL=""
 }
 
 create_merge_request() {
@@ -352,9 +907,11 @@ create_merge_request() {
     target="$3"
     title="$4"
     draft="$5"
+    dry_run="$6"
 
-    remote_url=$(git -C "$path" remote get-url origin 2>/dev/null || printf '')
-    tool=$(detect_mr_tool "$remote_url")
+    remote_url=$(git -C "$path" remote get-url origin 2>/dev/null) || remote_url=""
+    detect_mr_tool "$remote_url"
+    tool=$MR_TOOL
     if [ -z "$tool" ]; then
         printf 'No supported CLI (glab or gh) detected. Please create the merge request manually.\n' >&2
         if [ -n "$title" ]; then
@@ -383,54 +940,101 @@ create_merge_request() {
         fi
     fi
 
-    log_debug "Running MR command: $*"
-    if "$@"; then
+    if [ "$dry_run" -eq 1 ]; then
+        log_debug "Dry run; not running in $path: $*"
         return 0
     fi
-    return $?
+    log_debug "Running MR command in $path: $*"
+    # glab and gh work on the repository in the current directory; workers run
+    # in their own subshell, so changing into the submodule is safe here.
+    cd "$path" || return 1
+    "$@"
 }
 
-mr_command() {
-    target="$1"
-    title="$2"
-    draft="$3"
+mr_worker() {
+    name="$1"
+    path="$2"
+    target="$5"
+    title="$6"
+    draft="$7"
+    dry_run="$8"
 
-    found=0
-    while IFS='\t' read -r name path rel; do
-        module_selected "$name" || continue
-        status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-        if [ -z "$status" ]; then
-            continue
-        fi
-        branch=$(current_branch "$path")
-        if [ -z "$branch" ]; then
-            die "Submodule $name does not have an active branch; create one before opening an MR."
-        fi
-        found=1
-        if create_merge_request "$path" "$branch" "$target" "$title" "$draft"; then
-            printf 'Triggered merge request creation for %s (%s -> %s).\n' "$name" "$branch" "$target"
-        else
-            printf 'Skipped automated MR creation for %s; see message above.\n' "$name"
+    current_branch "$path"
+    branch=$CURRENT_BRANCH
+    if [ -z "$branch" ]; then
+        die "Submodule $name does not have an active branch; create one before opening an MR."
+    fi
+    if create_merge_request "$path" "$branch" "$target" "$title" "$draft" "$dry_run"; then
+        if [ "$dry_run" -eq 1 ]; then
+            printf 'Would create a merge request for %s (%s -> %s).\n' "$name" "$branch" "$target"
+            return 0
         fi
-    done <"$SUBMODULE_CACHE"
+        printf 'Triggered merge request creation for %s (%s -> %s).\n' "$name" "$branch" "$target"
+    else
+        printf 'Skipped automated MR creation for %s; see message above.\n' "$name"
+    fi
+}
 
-    if [ $found -eq 0 ]; then
+mr_command() {
+    # glab and gh prompt for whatever title/body/description they were not
+    # given, which only works in the foreground, so mr runs one module at a
+    # time unless --jobs asks otherwise. Even then, the GitLab/GitHub APIs
+    # rate limit clients, so fan out to at most 8 modules at a time.
+    if [ -z "$JOBS" ]; then
+        JOBS=1
+    elif [ "$JOBS" -gt 8 ]; then
+        JOBS=8
+    fi
+    find_mr_tools
+    for_each_module dirty mr_worker "$@"
+
+    if [ "$FOUND" -eq 0 ]; then
         printf 'No dirty submodules detected; no merge requests created.\n'
     fi
 }
 
+# Stage the given submodule paths with one "git add" and print the report
+# collected in batch_report.
+stage_batch() {
+    git -C "$REPO_ROOT" add -- "$@"
+    printf '%s' "$batch_report"
+    batch_report=""
+}
+
 update_parent_command() {
+    load_all_status
     found=0
-    while IFS='\t' read -r name path rel; do
+    # Stage all dirty submodules in a single "git add", only splitting the
+    # batch if the paths would come close to the system's ARG_MAX.
+    arg_max=$(getconf ARG_MAX 2>/dev/null || printf '131072')
+    batch_limit=$((arg_max / 2))
+    batch_size=0
+    batch_report=""
+    set --
+    set -f
+    IFS=$NL
+    for entry in $MODULE_TABLE; do
+        IFS=$ORIG_IFS
+        split_entry "$entry"
         module_selected "$name" || continue
-        status=$(git -C "$path" status --porcelain 2>/dev/null || true)
-        if [ -z "$status" ]; then
+        if [ "$dirty" -eq 0 ]; then
             continue
         fi
         found=1
-        git -C "$REPO_ROOT" add "$rel"
-        printf 'Staged updated hash for %s (%s).\n' "$name" "$rel"
-    done <"$SUBMODULE_CACHE"
+        if [ $# -gt 0 ] && [ $((batch_size + ${#rel} + 1)) -gt "$batch_limit" ]; then
+            stage_batch "$@"
+            set --
+            batch_size=0
+        fi
+        set -- "$@" "$rel"
+        batch_size=$((batch_size + ${#rel} + 1))
+        batch_report="${batch_report}Staged updated hash for $name ($rel).$NL"
+    done
+    IFS=$ORIG_IFS
+    set +f
+    if [ $# -gt 0 ]; then
+        stage_batch "$@"
+    fi
 
     if [ $found -eq 0 ]; then
         printf 'No dirty submodules detected; nothing to stage in the parent.\n'
@@ -492,6 +1096,7 @@ HELP
     push)
         REMOTE="origin"
         SET_UPSTREAM=0
+        DRY_RUN=0
         while [ $# -gt 0 ]; do
             case "$1" in
                 --remote)
@@ -504,9 +1109,13 @@ HELP
                     SET_UPSTREAM=1
                     shift
                     ;;
+                --dry-run)
+                    DRY_RUN=1
+                    shift
+                    ;;
                 -h|--help)
                     cat <<HELP
-Usage: $COMMAND_NAME [global options] push [--remote <remote>] [--set-upstream]
+Usage: $COMMAND_NAME [global options] push [--remote <remote>] [--set-upstream] [--dry-run]
 HELP
                     exit 0
                     ;;
@@ -518,12 +1127,13 @@ HELP
                     ;;
             esac
         done
-        push_command "$REMOTE" "$SET_UPSTREAM"
+        push_command "$REMOTE" "$SET_UPSTREAM" "$DRY_RUN"
         ;;
     mr)
         TARGET="main"
         TITLE=""
         DRAFT=0
+        DRY_RUN=0
         while [ $# -gt 0 ]; do
             case "$1" in
                 --target)
@@ -542,9 +1152,13 @@ HELP
                     DRAFT=1
                     shift
                     ;;
+                --dry-run)
+                    DRY_RUN=1
+                    shift
+                    ;;
                 -h|--help)
                     cat <<HELP
-Usage: $COMMAND_NAME [global options] mr [--target <branch>] [--title <title>] [--draft]
+Usage: $COMMAND_NAME [global options] mr [--target <branch>] [--title <title>] [--draft] [--dry-run]
 HELP
                     exit 0
                     ;;
@@ -556,7 +1170,7 @@ HELP
                     ;;
             esac
         done
-        mr_command "$TARGET" "$TITLE" "$DRAFT"
+        mr_command "$TARGET" "$TITLE" "$DRAFT" "$DRY_RUN"
         ;;
     update-parent)
         while [ $# -gt 0 ]; do